@@ -16,8 +16,12 @@
 from __future__ import annotations
 
 import re
+from bisect import bisect_left
 from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import Any, Callable, Iterable, Optional
 
+import numpy as np
 from bson.objectid import ObjectId
 from discord import Embed, Interaction
 from discord.app_commands import Choice, Transform, Transformer
@@ -25,7 +29,7 @@ from discord.ext import commands
 from discord.utils import remove_markdown
 from rapidfuzz import process
 
-from classes.client import Client
+from classes.client import WRAPPER, Client
 
 NM, SM, LM = (
     re.compile(r"Name\s*:\s*(.+)", re.IGNORECASE),
@@ -41,81 +45,219 @@ class Character:
     name: str = field(compare=False)
     description: str = field(compare=False)
     server: int = field(compare=False, default=638802665467543572)
+    _embed: Optional[Embed] = field(compare=False, default=None, init=False, repr=False)
+    _oc_name: Optional[str] = field(compare=False, default=None, init=False, repr=False)
+    _display_name: Optional[str] = field(compare=False, default=None, init=False, repr=False)
+    _wrapped: Optional[list[str]] = field(compare=False, default=None, init=False, repr=False)
 
     def __hash__(self) -> int:
         return hash(self._id)
 
+    def __setattr__(self, key: str, value: Any) -> None:
+        object.__setattr__(self, key, value)
+        if key in ("name", "description"):
+            object.__setattr__(self, "_embed", None)
+            object.__setattr__(self, "_oc_name", None)
+            object.__setattr__(self, "_display_name", None)
+            object.__setattr__(self, "_wrapped", None)
+
     def __contains__(self, item: str) -> bool:
         item = remove_markdown(item.lower())
         return item in self.name.lower() or item in self.description.lower()
 
+    @classmethod
+    async def converter(cls, ctx: commands.Context[Client] | Interaction[Client], argument: str) -> Character:
+        return await CharacterTransformer().convert(ctx, argument)
+
+    @property
+    def cache_keys(self) -> tuple[tuple[int, int, str], ...]:
+        """Keys the character is stored under in Client.oc_cache"""
+        return (
+            (self.server, self.user_id, self.name),
+            (self.server, self.user_id, str(self._id)),
+        )
+
     @property
     def created_at(self):
         return self._id.generation_time
 
     @property
     def embed(self):
-        embed = Embed(
-            title=self.name,
-            description=self.description,
-            timestamp=self.created_at,
-        )
-        embed.set_footer(text=f"ID: {self._id}")
-        return embed
+        if self._embed is None:
+            embed = Embed(
+                title=self.name,
+                description=self.description,
+                timestamp=self.created_at,
+            )
+            embed.set_footer(text=f"ID: {self._id}")
+            self._embed = embed
+        return self._embed
 
     @property
-    def oc_name(self):
-        desc = remove_markdown(self.description)
-        name = name[1].strip() if (name := NM.search(desc)) else self.name
-        return remove_markdown(name)
+    def wrapped(self) -> list[str]:
+        """Description split into message sized chunks"""
+        if self._wrapped is None:
+            self._wrapped = WRAPPER.wrap(self.description)
+        return self._wrapped
 
     @property
-    def display_name(self):
-        desc = remove_markdown(self.description)
-        name = name[1] if (name := NM.search(desc)) else self.name
-
-        if len(name) > 20:
-            name = f"{name[:20]}..."
-
-        if mon := SM.search(desc):
-            mon = mon[1].strip()
-            mon, *_ = mon.split(".")
-            mon, *_ = mon.split(",")
-            if len(mon) > 20:
-                mon = f"{mon[:20]}..."
-        else:
-            mon = "Unknown"
+    def oc_name(self) -> str:
+        if self._oc_name is None:
+            self._oc_name = parse_oc_name(self.name, self.description)
+        return self._oc_name
 
-        lvl = int(lvl[1]) if (lvl := LM.search(desc)) else 0
-        lvl = f"{lvl:,}".replace(",", "\u2009")
-        return remove_markdown(f"{lvl.zfill(3)}〙{name}《{mon.strip()}》")
+    @property
+    def display_name(self) -> str:
+        if self._display_name is None:
+            self._display_name = parse_display_name(self.name, self.description)
+        return self._display_name
 
 
-class CharacterTransformer(commands.Converter[Character], Transformer):
-    async def transform(self, interaction: Interaction[Client], argument: str) -> Character:
-        db = interaction.client.db("Characters")
+@dataclass(slots=True)
+class GuildCharacters:
+    """Cached characters of a server, with columns derived once per load"""
+
+    ocs: list[Character]
+    display_names: list[str] = field(init=False, repr=False)
+    oc_names: list[str] = field(init=False, repr=False)
+    by_oc_name: list[Character] = field(init=False, repr=False)
+    user_ids: np.ndarray = field(init=False, repr=False)
+    owners: list[int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Casefolded display names, parallel to ocs, for substring lookups
+        self.display_names = [oc.display_name.casefold() for oc in self.ocs]
+        # Sorted casefolded sheet names, parallel to by_oc_name, for prefix lookups
+        rows = sorted((oc.oc_name.casefold(), idx) for idx, oc in enumerate(self.ocs))
+        self.oc_names = [name for name, _ in rows]
+        self.by_oc_name = [self.ocs[idx] for _, idx in rows]
+        # Owner of each character, parallel to ocs, for vectorized filters
+        self.user_ids = np.fromiter((oc.user_id for oc in self.ocs), dtype=np.int64, count=len(self.ocs))
+        self.owners = np.unique(self.user_ids).tolist()
+
+    def owned_by(self, is_member: Callable[[int], Any], user_id: Optional[int] = None) -> list[int]:
+        """Indexes of the characters whose owner is still around
 
-        author = interaction.namespace.author or interaction.user
-        key = {"user_id": author.id, "server": interaction.guild_id}
-        data = {}
+        Parameters
+        ----------
+        is_member : Callable[[int], Any]
+            Lookup telling whether a user id is a member, only called once per owner
+        user_id : Optional[int], optional
+            Restrict to the characters of a single user, by default None
 
-        try:
-            data["_id"] = ObjectId(argument)
-        except Exception:
-            data["name"] = remove_markdown(argument)
+        Returns
+        -------
+        list[int]
+            Indexes within ocs, in their original order
+        """
+        if user_id is not None:
+            if not is_member(user_id):
+                return []
+            return np.flatnonzero(self.user_ids == user_id).tolist()
 
-        if result := await db.find_one(key | data):
-            return Character(**result)
+        present = np.fromiter((uid for uid in self.owners if is_member(uid)), dtype=np.int64)
+        return np.flatnonzero(np.isin(self.user_ids, present)).tolist()
 
-        ocs = {o: o.name async for oc in db.find(key) if (o := Character(**oc))}
+    def prefixed(self, prefix: str) -> list[Character]:
+        """Characters whose sheet name starts with a prefix
 
-        if not ocs:
-            raise commands.BadArgument("You have no characters")
+        Parameters
+        ----------
+        prefix : str
+            Start of the name, case insensitive
 
-        if result := process.extractOne(argument, ocs, score_cutoff=95):
-            return result[-1]
+        Returns
+        -------
+        list[Character]
+            Matching characters, ordered by sheet name
+        """
+        prefix = prefix.casefold()
+        lo = bisect_left(self.oc_names, prefix)
+        hi = bisect_left(self.oc_names, prefix + "\U0010ffff", lo)
+        return self.by_oc_name[lo:hi]
+
+
+def parse_oc_name(name: str, description: str) -> str:
+    """Name shown in the sheet, falling back to the stored name
+
+    Parameters
+    ----------
+    name : str
+        Stored name of the character
+    description : str
+        Description of the character
+
+    Returns
+    -------
+    str
+        Name without markdown
+    """
+    desc = remove_markdown(description)
+    name = item[1].strip() if (item := NM.search(desc)) else name
+    return remove_markdown(name)
+
+
+def parse_display_name(name: str, description: str) -> str:
+    """Level, name and species line used in character listings
+
+    Parameters
+    ----------
+    name : str
+        Stored name of the character
+    description : str
+        Description of the character
+
+    Returns
+    -------
+    str
+        Listing entry without markdown
+    """
+    desc = remove_markdown(description)
+    name = item[1] if (item := NM.search(desc)) else name
+
+    if len(name) > 20:
+        name = f"{name[:20]}..."
+
+    if mon := SM.search(desc):
+        mon = mon[1].strip()
+        mon, *_ = mon.split(".")
+        mon, *_ = mon.split(",")
+        if len(mon) > 20:
+            mon = f"{mon[:20]}..."
+    else:
+        mon = "Unknown"
+
+    lvl = int(lvl[1]) if (lvl := LM.search(desc)) else 0
+    lvl = f"{lvl:,}".replace(",", "\u2009")
+    return remove_markdown(f"{lvl.zfill(3)}〙{name}《{mon.strip()}》")
+
+
+def add_attachments(description: str, urls: Iterable[str]) -> str:
+    """Append image urls to the attachments section of a description
+
+    Parameters
+    ----------
+    description : str
+        Description of the character
+    urls : Iterable[str]
+        Urls to list as attachments
+
+    Returns
+    -------
+    str
+        Description ending with a single attachments section
+    """
+    text, sep, imgs = description.rpartition("\n# Attachments\n")
+    if not sep:
+        text, imgs = description, ""
+    lines = [imgs.strip()] if imgs.strip() else []
+    lines.extend(f"* {url}" for url in urls)
+    return f"{text.strip()}\n# Attachments\n" + "\n".join(lines)
 
-        raise commands.BadArgument(f"Character {argument!r} not found")
+
+class CharacterTransformer(commands.Converter[Character], Transformer):
+    async def transform(self, interaction: Interaction[Client], argument: str) -> Character:
+        return await self.convert(interaction, argument)
 
     async def autocomplete(self, interaction: Interaction[Client], value: str) -> list[Choice[str]]:
         db = interaction.client.db("Characters")
@@ -123,8 +265,8 @@ class CharacterTransformer(commands.Converter[Character], Transformer):
         author = interaction.namespace.author or interaction.user
         key = {"user_id": author.id, "server": interaction.guild_id}
 
-        ocs = [Character(**oc) async for oc in db.find(key)]
-        ocs.sort(key=lambda x: x.oc_name)
+        docs = await db.find(key).sort("name", 1).to_list(length=None)
+        ocs = sorted((Character(**oc) for oc in docs), key=attrgetter("oc_name"))
 
         items = [x for x in ocs if value.lower() in x.display_name.lower()] if value else ocs
         return [Choice(name=item.display_name, value=str(item._id)) for item in items[:25]]
@@ -145,13 +287,20 @@ class CharacterTransformer(commands.Converter[Character], Transformer):
             Character object
         """
         if isinstance(ctx, Interaction):
-            db = ctx.client.db("Characters")
+            bot = ctx.client
             user = ctx.namespace.author or ctx.user
         else:
-            db = ctx.bot.db("Characters")
+            bot = ctx.bot
             user = ctx.author
 
-        key = {"user_id": user.id, "server": ctx.guild and ctx.guild.id}
+        db = bot.db("Characters")
+
+        server = ctx.guild and ctx.guild.id
+        # Names match exactly, the same as the find_one and the unique index below
+        if oc := bot.oc_cache.get((server, user.id, remove_markdown(argument))):
+            return oc
+
+        key = {"user_id": user.id, "server": server}
         data = {}
 
         try:
@@ -160,7 +309,9 @@ class CharacterTransformer(commands.Converter[Character], Transformer):
             data["name"] = remove_markdown(argument)
 
         if result := await db.find_one(key | data):
-            return Character(**result)
+            oc = Character(**result)
+            bot.cache_character(oc)
+            return oc
 
         ocs = {o: o.name async for oc in db.find(key) if (o := Character(**oc))}
 
@@ -168,7 +319,9 @@ class CharacterTransformer(commands.Converter[Character], Transformer):
             raise commands.BadArgument("You have no characters")
 
         if result := process.extractOne(argument, ocs, score_cutoff=95):
-            return result[-1]
+            oc = result[-1]
+            bot.cache_character(oc)
+            return oc
 
         raise commands.BadArgument(f"Character {argument!r} not found")
 
@@ -20,11 +20,33 @@ import sys
 from logging import Logger
 from pathlib import Path, PurePath
 from textwrap import TextWrapper
+from typing import TYPE_CHECKING, Optional
 
 import discord
+from cachetools import LRUCache, TTLCache
 from discord.ext import commands
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 
+if TYPE_CHECKING:
+    from classes.character import Character, GuildCharacters
+
+WRAPPER = TextWrapper(
+    width=2000,
+    break_long_words=True,
+    break_on_hyphens=False,
+    replace_whitespace=False,
+    drop_whitespace=True,
+    fix_sentence_endings=False,
+)
+E_WRAPPER = TextWrapper(
+    width=4000,
+    break_long_words=True,
+    break_on_hyphens=False,
+    replace_whitespace=False,
+    drop_whitespace=True,
+    fix_sentence_endings=False,
+)
+
 
 class Client(commands.Bot):
     def __init__(self, log: Logger) -> None:
@@ -38,27 +60,34 @@ class Client(commands.Bot):
             allowed_mentions=discord.AllowedMentions.none(),
         )
         self.log = log
-        self.wrapper = TextWrapper(
-            width=2000,
-            break_long_words=True,
-            break_on_hyphens=False,
-            replace_whitespace=False,
-            drop_whitespace=True,
-            fix_sentence_endings=False,
+        self.wrapper = WRAPPER
+        self.e_wrapper = E_WRAPPER
+        self.mongodb = AsyncIOMotorClient(
+            os.getenv("MONGO_URI"),
+            maxPoolSize=int(os.getenv("MONGO_POOL_MAX", "50")),
+            minPoolSize=int(os.getenv("MONGO_POOL_MIN", "5")),
+            waitQueueTimeoutMS=2000,
         )
-        self.e_wrapper = TextWrapper(
-            width=4000,
-            break_long_words=True,
-            break_on_hyphens=False,
-            replace_whitespace=False,
-            drop_whitespace=True,
-            fix_sentence_endings=False,
-        )
-        self.mongodb = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+        self.oc_cache: LRUCache[tuple[int, int, str], Character] = LRUCache(maxsize=512)
+        self.guild_cache: TTLCache[int, GuildCharacters] = TTLCache(maxsize=128, ttl=30.0)
+        self.list_cache: TTLCache[tuple[Optional[int], int], str] = TTLCache(maxsize=256, ttl=10.0)
 
     def db(self, db: str) -> AsyncIOMotorCollection:
         return self.mongodb.Eonlia[db]
 
+    def cache_character(self, oc: Character) -> None:
+        self.oc_cache.update(dict.fromkeys(oc.cache_keys, oc))
+
+    def uncache_character(self, oc: Character) -> None:
+        for key in oc.cache_keys:
+            self.oc_cache.pop(key, None)
+
+    def uncache_guild(self, server: Optional[int]) -> None:
+        self.guild_cache.pop(server, None)
+
+    def uncache_listing(self, server: Optional[int], user_id: int) -> None:
+        self.list_cache.pop((server, user_id), None)
+
     async def on_error(self, event_method: str, /, *args, **kwargs) -> None:
         self.log.exception(
             "Ignoring exception in %s",
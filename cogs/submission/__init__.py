@@ -13,24 +13,331 @@
 # limitations under the License.
 
 
+import asyncio
 import io
-from itertools import groupby
-from typing import Optional, Annotated
+import math
+import re
+from collections import defaultdict
+from copy import copy
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from typing import Annotated, Any, Callable, Iterable, Iterator, Optional
+from weakref import WeakValueDictionary
 
 import discord
-import matplotlib.pyplot as plt
 import numpy as np
+from bson.objectid import ObjectId
 from discord import app_commands
 from discord.ext import commands
-from discord.utils import escape_mentions, remove_markdown
-from rapidfuzz import process
-from scipy.stats import norm
-
-from classes.character import Character, CharacterArg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError, WriteError
+from rapidfuzz import fuzz, process, utils
+
+from classes.batcher import AsyncBatcher
+from classes.character import (
+    Character,
+    CharacterArg,
+    GuildCharacters,
+    add_attachments,
+    parse_display_name,
+    parse_oc_name,
+)
 from classes.client import Client
 from cogs.submission.modals import CreateCharacterModal, UpdateCharacterModal
 from cogs.submission.sheets import Sheet
-from cogs.submission.stats import Kind, KindArg, SizeArg, StatArg
+from cogs.submission.stats import STAT_FLOATS, Kind, KindArg, SizeArg, StatArg
+
+STAT_NAMES = ("HP", "Attack", "Defense", "Sp. Attack", "Sp. Defense", "Speed")
+DEFAULT_STATS = (1.0,) * len(STAT_NAMES)
+
+WriteOp = DeleteOne | UpdateOne
+LIST_EMBED = discord.Embed(title="Characters")
+
+# Plotting bypasses pyplot, the figure is drawn off the event loop one call at a time
+FIGURE = Figure(figsize=(10, 6))
+CANVAS = FigureCanvasAgg(FIGURE)
+AXES = FIGURE.add_subplot(111)
+PLOT_LOCK = asyncio.Lock()
+SQRT_2PI = math.sqrt(2 * math.pi)
+
+# Cold cache text searches, anything truncated or thinner than this widens to the whole server
+TEXT_SEARCH_LIMIT = 50
+TEXT_SEARCH_MIN_HITS = 5
+
+
+# Same patterns as discord.utils.remove_markdown (ignore_links=True) and escape_mentions
+MARKDOWN_RE = re.compile(
+    r"(?:(?P<url><[^: >]+:\/[^ >]+>|(?:https?|steam):\/\/[^\s<]+[^<.,:;\"\'\]\s])"
+    r"|(?P<markdown>[_\\~|\*`]|^>(?:>>)?\s|\[.+\]\(.+\)|^#{1,3}|^\s*-))",
+    re.MULTILINE,
+)
+MENTION_RE = re.compile(r"@(everyone|here|[!&]?[0-9]{17,20})")
+# Every markdown alternative needs one of these, urls are substituted by themselves
+MARKDOWN_CHARS = frozenset("_\\~|*`>[#-")
+
+
+@lru_cache(maxsize=4096)
+def clean_markdown(text: str) -> str:
+    """Precompiled remove_markdown, cached as names and queries repeat often"""
+    if MARKDOWN_CHARS.isdisjoint(text):
+        return text
+    return MARKDOWN_RE.sub(lambda m: m["url"] or "", text)
+
+
+def clean_mentions(text: str) -> str:
+    """Precompiled escape_mentions, left uncached as descriptions rarely repeat"""
+    if "@" not in text:
+        return text
+    return MENTION_RE.sub("@\u200b\\1", text)
+
+
+def fuzzy_find(query: str, names: list[str], score_cutoff: float) -> Optional[tuple[str, float, int]]:
+    """Best match for a query among character names
+
+    Parameters
+    ----------
+    query : str
+        Text to look for
+    names : list[str]
+        Names to compare against
+    score_cutoff : float
+        Minimum score to accept
+
+    Returns
+    -------
+    Optional[tuple[str, float, int]]
+        Matched name, score and index within names
+    """
+    return process.extractOne(
+        query,
+        names,
+        scorer=fuzz.WRatio,
+        processor=utils.default_process,
+        score_cutoff=score_cutoff,
+    )
+
+
+def fuzzy_search(query: str, names: list[str], score_cutoff: float) -> list[int]:
+    """Indexes of every name matching a query, best first
+
+    Parameters
+    ----------
+    query : str
+        Text to look for
+    names : list[str]
+        Names to compare against
+    score_cutoff : float
+        Minimum score to accept
+
+    Returns
+    -------
+    list[int]
+        Indexes within names
+    """
+    if not names:
+        return []
+
+    scores = process.cdist(
+        [query],
+        names,
+        scorer=fuzz.WRatio,
+        processor=utils.default_process,
+        score_cutoff=score_cutoff,
+        dtype=np.uint8,
+        workers=-1,
+    )[0]
+    idx = np.flatnonzero(scores >= score_cutoff)
+    # Widen before negating, uint8 would wrap around
+    order = np.argsort(-scores[idx].astype(np.int16), kind="stable")
+    return idx[order].tolist()
+
+
+def group_by_user(ocs: Iterable[Character], key: Callable[[Character], Any]) -> dict[int, list[Character]]:
+    """Group characters by owner in a single pass
+
+    Parameters
+    ----------
+    ocs : Iterable[Character]
+        Characters to group
+    key : Callable[[Character], Any]
+        Sort key applied within each group
+
+    Returns
+    -------
+    dict[int, list[Character]]
+        Sorted characters per user id, ordered by user id
+    """
+    # Storing the bound append avoids an attribute lookup per character
+    groups: defaultdict[int, Callable[[Character], None]] = defaultdict(lambda: [].append)
+    for oc in ocs:
+        groups[oc.user_id](oc)
+    return {k: sorted(append.__self__, key=key) for k, append in sorted(groups.items())}
+
+
+def truncate_join(lines: Iterable[str], cap: int = 1024) -> str:
+    """Join lines with newlines, stopping before the result exceeds cap
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines to join
+    cap : int, optional
+        Maximum length of the result, by default 1024
+
+    Returns
+    -------
+    str
+        Joined lines, only whole lines are kept
+    """
+    out: list[str] = []
+    size = -1
+    for line in lines:
+        size += len(line) + 1
+        if size > cap:
+            if not out:
+                return line[:cap]
+            break
+        out.append(line)
+    return "\n".join(out)
+
+
+def format_points(value: float) -> str:
+    """Two decimal number grouped by thin spaces"""
+    return format(value, "_.2f").replace("_", "\u2009")
+
+
+def chunk_lines(lines: Iterable[str], limit: int = 2000) -> Iterator[str]:
+    """Join lines into messages of at most limit characters, as they come
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines to send
+    limit : int, optional
+        Maximum length of each message, by default 2000
+
+    Yields
+    ------
+    str
+        Message content, lines are only split when longer than limit
+    """
+    buf: list[str] = []
+    size = -1
+    for line in lines:
+        while len(line) > limit:
+            if buf:
+                yield "\n".join(buf)
+                buf, size = [], -1
+            yield line[:limit]
+            line = line[limit:]
+        if size + len(line) + 1 > limit:
+            yield "\n".join(buf)
+            buf, size = [], -1
+        buf.append(line)
+        size += len(line) + 1
+    if buf:
+        yield "\n".join(buf)
+
+
+def listing_lines(data: dict[Any, list[Character]]) -> Iterator[str]:
+    """Mention header and bullet lines of grouped characters
+
+    Parameters
+    ----------
+    data : dict[Any, list[Character]]
+        Characters per member, anything with a mention attribute
+
+    Yields
+    ------
+    str
+        One line at a time
+    """
+    for m, ocs in data.items():
+        yield f"## {m.mention}"
+        for oc in ocs:
+            yield f"* {oc.display_name}"
+
+
+def size_curve(mean: float) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """Normal distribution of a size, with the area within 25% of the mean
+
+    Parameters
+    ----------
+    mean : float
+        Average size of the species
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray, float]
+        x values, density values, mask of the shaded region and its area
+    """
+    std_dev = 0.15 * mean
+
+    # Generate x values for the normal distribution curve
+    x = np.linspace(mean - 2.5 * std_dev, mean + 2.5 * std_dev, 1000)
+
+    # Normal probability density, evaluated in closed form
+    y = np.exp(-0.5 * ((x - mean) / std_dev) ** 2) / (std_dev * SQRT_2PI)
+
+    # Create a mask for the shaded area between lower and upper limits
+    mask = (x >= 0.75 * mean) & (x <= 1.25 * mean)
+
+    # Trapezoidal area under the curve for the shaded region
+    xm, ym = x[mask], y[mask]
+    area = float(np.dot(np.diff(xm), ym[1:] + ym[:-1]) / 2)
+    return x, y, mask, area
+
+
+def plot_size(mean: float) -> io.BytesIO:
+    """Render the size distribution plot
+
+    Uses the shared figure, so calls must be serialized with PLOT_LOCK.
+
+    Parameters
+    ----------
+    mean : float
+        Average size of the species
+
+    Returns
+    -------
+    io.BytesIO
+        PNG image
+    """
+    lower_limit = 0.75 * mean
+    upper_limit = 1.25 * mean
+    std_dev = 0.15 * mean
+
+    x, y, mask, area = size_curve(mean)
+    percentage = area * 100
+
+    # Convert mean, lower limit, upper limit, and standard deviation to feet-inches
+    mean_ft, mean_inch = mean // 0.3048, mean / 0.3048 % 1 * 12
+    std_dev_ft, std_dev_inch = std_dev // 0.3048, std_dev / 0.3048 % 1 * 12
+
+    # Determine the number of ticks dynamically based on the requirement
+    ticks_values = np.linspace(lower_limit, upper_limit, 5)
+    feet_ticks = [f"{val:.02f} m\n{int(val // 0.3048)}' {int(val / 0.3048 % 1 * 12)}\"ft" for val in ticks_values]
+
+    # Create the plot with improved aesthetics, reusing the shared figure
+    AXES.clear()
+    AXES.plot(x, y, color="darkblue", label="Normal Distribution", linewidth=2)
+    AXES.fill_between(x, y, where=mask, alpha=0.5, color="skyblue", label=f"Shaded Area ({percentage:.2f}%)")
+    AXES.set_title(
+        f"Normal Distribution (Mean: {mean_ft:.0f}' {mean_inch:.1f}\" / {mean:.2f}m | SD: {std_dev_ft:.0f}' {std_dev_inch:.1f}\" / {std_dev:.2f}m)",
+        fontsize=16,
+    )
+    AXES.legend(fontsize=12)
+    AXES.grid(True, linestyle="--", alpha=0.7)
+    AXES.set_xticks(ticks_values, feet_ticks, fontsize=12, fontweight="bold")
+    FIGURE.tight_layout()
+
+    # Save the plot to a BytesIO object
+    buf = io.BytesIO()
+    CANVAS.print_png(buf, pil_kwargs={"compress_level": 1})
+    buf.seek(0)
+    return buf
 
 
 class Submission(commands.Cog):
@@ -38,12 +345,189 @@ class Submission(commands.Cog):
         self.bot = bot
         self.db = bot.db("Characters")
         self.itx_menu1 = app_commands.ContextMenu(name="See list", callback=self.list_menu)
+        self.writer: AsyncBatcher[WriteOp, Optional[ObjectId]] = AsyncBatcher(
+            self.flush_writes,
+            flush_interval=0.05,
+            max_batch=100,
+        )
+        self.user_locks: WeakValueDictionary[int, asyncio.Lock] = WeakValueDictionary()
 
     async def cog_load(self):
         self.bot.tree.add_command(self.itx_menu1)
+        if not await self.ensure_index([("server", 1), ("user_id", 1), ("name", 1)], unique=True):
+            # Per user lookups would otherwise lose the index prefix they rely on
+            await self.ensure_index([("server", 1), ("user_id", 1)])
+        await self.ensure_index([("server", 1), ("name", 1)])
+        await self.ensure_index([("name", "text"), ("description", "text")])
+
+    async def ensure_index(self, keys: list[tuple[str, Any]], **kwargs: Any) -> bool:
+        """Create a character index, logging instead of raising on failure
+
+        Parameters
+        ----------
+        keys : list[tuple[str, Any]]
+            Fields and directions of the index
+        **kwargs : Any
+            Options passed to create_index
+
+        Returns
+        -------
+        bool
+            Whether the index exists now
+        """
+        try:
+            await self.db.create_index(keys, **kwargs)
+        except PyMongoError as e:
+            self.bot.log.warning("Unable to create character index %s", keys, exc_info=e)
+            return False
+        return True
 
     async def cog_unload(self) -> None:
         self.bot.tree.remove_command(self.itx_menu1.name, type=self.itx_menu1.type)
+        await self.writer.close()
+
+    async def guild_characters(self, guild: discord.Guild) -> GuildCharacters:
+        """Characters of a server's current members, cached for a short time
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            Server to get the characters from
+
+        Returns
+        -------
+        GuildCharacters
+            Characters of the server, must not be mutated
+        """
+        if (cached := self.bot.guild_cache.get(guild.id)) is None:
+            owners = await self.db.distinct("user_id", {"server": guild.id})
+            members = [uid for uid in owners if guild.get_member(uid)]
+            ocs = [
+                Character(**oc, server=guild.id)
+                async for oc in self.db.find({"server": guild.id, "user_id": {"$in": members}}, {"server": 0})
+            ]
+            cached = self.bot.guild_cache[guild.id] = GuildCharacters(ocs)
+        return cached
+
+    async def text_search(
+        self,
+        guild: discord.Guild,
+        query: str,
+        user_id: Optional[int] = None,
+        limit: int = TEXT_SEARCH_LIMIT,
+    ) -> list[Character]:
+        """Characters matching a query through the text index, best first
+
+        Meant for cold server caches, so a one-off search does not load the whole server.
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            Server to search in
+        query : str
+            Words to look for
+        user_id : Optional[int], optional
+            Restrict to the characters of a single user, by default None
+        limit : int, optional
+            Maximum amount of candidates, by default 50
+
+        Returns
+        -------
+        list[Character]
+            Characters of current members, empty if the text index is unavailable
+        """
+        key: dict[str, Any] = {"$text": {"$search": query}, "server": guild.id}
+        if user_id is not None:
+            key["user_id"] = user_id
+
+        score = {"$meta": "textScore"}
+        cursor = self.db.find(key, {"server": 0, "score": score}).sort([("score", score)]).limit(limit)
+
+        items: list[Character] = []
+        try:
+            async for oc in cursor:
+                del oc["score"]
+                if guild.get_member(oc["user_id"]):
+                    items.append(Character(**oc, server=guild.id))
+        except OperationFailure:
+            return []
+        return items
+
+    async def text_prefilter(
+        self,
+        guild: discord.Guild,
+        query: str,
+        user_id: Optional[int] = None,
+    ) -> list[Character]:
+        """Fuzzy matches among the text index candidates, when they can stand in for a full search
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            Server to search in
+        query : str
+            Words to look for
+        user_id : Optional[int], optional
+            Restrict to the characters of a single user, by default None
+
+        Returns
+        -------
+        list[Character]
+            Matches best first, empty when the server has to be searched as a whole
+        """
+        cands = await self.text_search(guild, query, user_id)
+        # A capped candidate set may hide better matches, and typos are never tokenized
+        if len(cands) >= TEXT_SEARCH_LIMIT:
+            return []
+        items = [cands[i] for i in fuzzy_search(query, [oc.name for oc in cands], score_cutoff=80)]
+        return items if len(items) >= TEXT_SEARCH_MIN_HITS else []
+
+    def user_lock(self, user_id: int) -> asyncio.Lock:
+        """Lock serializing a user's character writes
+
+        Locks are only weakly referenced, so they are dropped once no command holds them.
+
+        Parameters
+        ----------
+        user_id : int
+            User performing the write
+
+        Returns
+        -------
+        asyncio.Lock
+            Lock shared by the user's running commands
+        """
+        if (lock := self.user_locks.get(user_id)) is None:
+            lock = self.user_locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def flush_writes(self, ops: list[WriteOp]) -> list[Optional[ObjectId] | WriteError]:
+        """Run queued writes as a single unordered bulk_write
+
+        Parameters
+        ----------
+        ops : list[WriteOp]
+            Operations in submission order
+
+        Returns
+        -------
+        list[Optional[ObjectId] | WriteError]
+            Upserted id (or None) per operation, or the error it failed with
+        """
+        results: list[Optional[ObjectId] | WriteError] = [None] * len(ops)
+        try:
+            result = await self.db.bulk_write(ops, ordered=False)
+            upserted = result.upserted_ids or {}
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                kind = DuplicateKeyError if error["code"] == 11000 else WriteError
+                results[error["index"]] = kind(error["errmsg"], error["code"], error)
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+        for index, _id in upserted.items():
+            results[index] = _id
+
+        return results
 
     @commands.guild_only()
     @commands.hybrid_group(
@@ -60,18 +544,18 @@ class Submission(commands.Cog):
         ctx : commands.Context
             Context of the command
         """
-        ocs = {
-            o: o.name
-            async for oc in self.db.find({"server": ctx.guild and ctx.guild.id})
-            if (ctx.guild and ctx.guild.get_member(oc["user_id"]))
-            and (o := Character(**oc)).oc_name.lower().startswith(text.lower())
-        }
+        cached = await self.guild_characters(ctx.guild)
+        get_member = ctx.guild.get_member
+        ocs = [oc for oc in cached.prefixed(text) if get_member(oc.user_id)]
 
-        if len(text) >= 2 and (result := process.extractOne(text, ocs, score_cutoff=90)):
-            return await ctx.invoke(self.read, oc=result[-1])
+        # A lone prefix match is the character being typed, skip scoring and listing
+        if len(ocs) == 1:
+            return await ctx.invoke(self.read, oc=ocs[0])
 
-        ocs = sorted(ocs, key=lambda x: (x.user_id, x.oc_name))
-        data = {m: list(v) for k, v in groupby(ocs, lambda x: x.user_id) if (m := ctx.guild.get_member(k))}
+        if len(text) >= 2 and (result := fuzzy_find(text, [oc.name for oc in ocs], score_cutoff=90)):
+            return await ctx.invoke(self.read, oc=ocs[result[2]])
+
+        data = {m: v for k, v in group_by_user(ocs, key=attrgetter("oc_name")).items() if (m := get_member(k))}
 
         embeds = [
             discord.Embed(
@@ -81,17 +565,19 @@ class Submission(commands.Cog):
             for k, v in data.items()
         ]
 
-        if embeds and len(embeds) <= 10 and sum(len(x) for x in embeds) <= 6000:
+        # Anything that does not fit whole goes to the text listing, nothing is cut
+        if (
+            embeds
+            and len(embeds) <= 10
+            and sum(len(x) for x in embeds) <= 6000
+            and all(len(x.description) <= 4096 for x in embeds)
+        ):
             return await ctx.reply(embeds=embeds, ephemeral=True)
 
-        for text in ctx.bot.wrapper.wrap(
-            "\n".join(
-                f"## {m.mention}\n" + "\n".join(f"* {oc.display_name}" for oc in v)
-                for k, v in groupby(ocs, lambda x: x.user_id)
-                if (m := ctx.guild and ctx.guild.get_member(k))
-            )
-            or "No characters found."
-        ):
+        if not data:
+            return await ctx.reply(content="No characters found.", ephemeral=True)
+
+        for text in chunk_lines(listing_lines(data), limit=ctx.bot.wrapper.width):
             await ctx.reply(content=text, ephemeral=True)
 
     @char.app_command.command()
@@ -125,9 +611,9 @@ class Submission(commands.Cog):
     async def add(
         self,
         ctx: commands.Context[Client],
-        name: Annotated[str, remove_markdown] = "",
+        name: Annotated[str, clean_markdown] = "",
         *,
-        description: Annotated[str, escape_mentions] = "",
+        description: Annotated[str, clean_mentions] = "",
     ):
         """Create a new character
 
@@ -163,25 +649,33 @@ class Submission(commands.Cog):
                 )
 
             if ctx.message and ctx.message.attachments:
-                description, *imgs = description.split("\n# Attachments\n")
-                imgs = "\n".join(x.strip() for x in imgs if x) + "\n".join(
-                    f"* {item.proxy_url}" for item in ctx.message.attachments
-                )
-                description = f"{description.strip()}\n# Attachments\n{imgs}"
-
-            try:
-                oc = await Character.converter(ctx, name)
-                await ctx.reply(f"{oc.name!r} already exists.", ephemeral=True)
-            except commands.BadArgument:
-                await self.db.insert_one(
-                    {
-                        "name": name.strip(),
-                        "description": description.strip(),
-                        "user_id": ctx.author.id,
-                        "server": ctx.guild.id if ctx.guild else None,
-                    }
-                )
-                await ctx.reply(f"Created {name!r}", ephemeral=True)
+                description = add_attachments(description, (item.proxy_url for item in ctx.message.attachments))
+
+            name, description = name.strip(), description.strip()
+            key = {"name": name, "user_id": ctx.author.id, "server": ctx.guild.id}
+            async with self.user_lock(ctx.author.id):
+                try:
+                    upserted_id = await self.writer.submit(
+                        UpdateOne(key, {"$setOnInsert": {"description": description}}, upsert=True)
+                    )
+                except DuplicateKeyError:
+                    upserted_id = None
+
+                if upserted_id is None:
+                    await ctx.reply(f"{name!r} already exists.", ephemeral=True)
+                else:
+                    self.bot.uncache_guild(ctx.guild.id)
+                    self.bot.uncache_listing(ctx.guild.id, ctx.author.id)
+                    self.bot.cache_character(
+                        Character(
+                            _id=upserted_id,
+                            user_id=ctx.author.id,
+                            name=name,
+                            description=description,
+                            server=ctx.guild.id,
+                        )
+                    )
+                    await ctx.reply(f"Created {name!r}", ephemeral=True)
         elif ctx.interaction:
             modal = CreateCharacterModal()
             modal.name.default = name
@@ -196,9 +690,9 @@ class Submission(commands.Cog):
     async def addchar(
         self,
         ctx: commands.Context[Client],
-        name: Annotated[str, remove_markdown] = "",
+        name: Annotated[str, clean_markdown] = "",
         *,
-        description: Annotated[str, escape_mentions] = "",
+        description: Annotated[str, clean_mentions] = "",
     ):
         """Create a new character
 
@@ -227,48 +721,45 @@ class Submission(commands.Cog):
             Character
         """
         info = f"# ============================\nID: {oc._id} | Created by <@{oc.user_id}>"
-        for text in ctx.bot.wrapper.wrap(f"{oc.description.removesuffix(info).strip()}\n{info}"):
+        content = f"{oc.description.removesuffix(info).strip()}\n{info}"
+        chunks = (content,) if len(content) <= ctx.bot.wrapper.width else ctx.bot.wrapper.wrap(content)
+        # Sequential on purpose, the first reply of a slash command must finish before followups
+        for text in chunks:
             await ctx.reply(content=text, ephemeral=True)
 
     @char.command(with_app_command=False)
-    async def query(self, ctx: commands.Context[Client], *, query: Annotated[str, remove_markdown] = ""):
+    async def query(self, ctx: commands.Context[Client], *, query: Annotated[str, clean_markdown] = ""):
         """Query characters
 
         Parameters
         ----------
         ctx : commands.Context[Client]
             Context of the command
-        query : remove_markdown, optional
+        query : clean_markdown, optional
             Query to search for, by default ""
         """
         embed = discord.Embed(title="Characters", color=ctx.author.color)
-        ocs = [
-            Character(**oc)
-            async for oc in self.db.find({"server": ctx.guild.id})
-            if ctx.guild and ctx.guild.get_member(oc["user_id"])
-        ]
-        items = [
-            x
-            for x, _, _ in process.extract(
-                query,
-                ocs,
-                processor=lambda x: x.name if isinstance(x, Character) else x,
-                score_cutoff=80,
-            )
-        ]
+        get_member = ctx.guild.get_member
+        items = []
+
+        if query and ctx.guild.id not in self.bot.guild_cache:
+            items = await self.text_prefilter(ctx.guild, query)
 
-        if not items and query:
-            query: str = query.lower()
-            items.extend(x for x in ocs if query in x.display_name.lower())
+        if not items:
+            cached = await self.guild_characters(ctx.guild)
+            rows = cached.owned_by(get_member)
+            ocs = [cached.ocs[i] for i in rows]
+            items = [ocs[i] for i in fuzzy_search(query, [oc.name for oc in ocs], score_cutoff=80)]
 
-        items.sort(key=lambda x: (x.user_id, x.oc_name))
+            if not items and query:
+                query: str = query.casefold()
+                items.extend(cached.ocs[i] for i in rows if query in cached.display_names[i])
 
-        for k, v in groupby(items, key=lambda x: x.user_id):
-            m = ctx.guild and ctx.guild.get_member(k)
-            if m and len(embed.fields) < 25:
+        for k, v in group_by_user(items, key=attrgetter("oc_name")).items():
+            if (m := get_member(k)) and len(embed.fields) < 25:
                 embed.add_field(
                     name=str(m),
-                    value="\n".join(f"* {oc.display_name}" for oc in v)[:1024],
+                    value=truncate_join(f"* {oc.display_name}" for oc in v),
                 )
 
         if len(embed) > 6000:
@@ -298,9 +789,14 @@ class Submission(commands.Cog):
         if not query:
             return await ctx.invoke(self.list, user=author)
 
-        ocs = {o: o.name async for oc in self.db.find({"user_id": author.id, "server": ctx.guild.id}) if (o := Character(**oc))}
-        if result := process.extractOne(query, ocs, score_cutoff=80):
-            return await ctx.invoke(self.read, oc=result[-1])
+        if ctx.guild.get_member(author.id):
+            ocs = [oc for oc in (await self.guild_characters(ctx.guild)).ocs if oc.user_id == author.id]
+        else:
+            # Former members are left out of the server cache
+            key = {"server": ctx.guild.id, "user_id": author.id}
+            ocs = [Character(**oc) async for oc in self.db.find(key)]
+        if result := fuzzy_find(query, [oc.name for oc in ocs], score_cutoff=80):
+            return await ctx.invoke(self.read, oc=ocs[result[2]])
 
         await ctx.reply("No characters found.", ephemeral=True)
 
@@ -331,34 +827,30 @@ class Submission(commands.Cog):
         if isinstance(oc, Character):
             info = f"# ============================\nID: {oc._id} | Created by <@{oc.user_id}>"
             content = f"{oc.description.removesuffix(info).strip()}\n{info}"
+            chunks = self.bot.wrapper.wrap(content)
         else:
-            key = {} if author is None else {"user_id": author.id}
             guild = itx.guild or itx.user.mutual_guilds[0]
-            ocs = [Character(**oc) async for oc in self.db.find(key) if guild.get_member(oc["user_id"])]
-            query = remove_markdown(query)
-            items = [
-                x
-                for x, _, _ in process.extract(
-                    query,
-                    ocs,
-                    processor=lambda x: x.name if isinstance(x, Character) else x,
-                    score_cutoff=80,
-                )
-            ]
+            get_member = guild.get_member
+            query = clean_markdown(query)
+            items = []
+
+            if query and guild.id not in self.bot.guild_cache:
+                items = await self.text_prefilter(guild, query, author and author.id)
 
             if not items:
-                query = query.lower()
-                items.extend(x for x in ocs if query in x.display_name.lower())
+                cached = await self.guild_characters(guild)
+                rows = cached.owned_by(get_member, author and author.id)
+                ocs = [cached.ocs[i] for i in rows]
+                items = [ocs[i] for i in fuzzy_search(query, [oc.name for oc in ocs], score_cutoff=80)]
 
-            items.sort(key=lambda x: (x.user_id, x.name))
+                if not items:
+                    query = query.casefold()
+                    items.extend(cached.ocs[i] for i in rows if query in cached.display_names[i])
 
-            content = "\n".join(
-                f"## {m.mention}\n" + "\n".join(f"* {oc.display_name}" for oc in v)
-                for k, v in groupby(items, lambda x: x.user_id)
-                if (m := guild.get_member(k))
-            )
+            data = {m: v for k, v in group_by_user(items, key=attrgetter("name")).items() if (m := get_member(k))}
+            chunks = chunk_lines(listing_lines(data), limit=self.bot.wrapper.width)
 
-        for text in self.bot.wrapper.wrap(content):
+        for text in chunks:
             await itx.followup.send(content=text, ephemeral=True)
 
     @char.command(aliases=["del", "remove"])
@@ -372,8 +864,14 @@ class Submission(commands.Cog):
         oc: Character
             Character to delete
         """
-        await self.db.delete_one({"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id})
-        await ctx.reply(embed=oc.embed)
+        async with self.user_lock(ctx.author.id):
+            await self.writer.submit(
+                DeleteOne({"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id})
+            )
+            self.bot.uncache_character(oc)
+            self.bot.uncache_guild(oc.server)
+            self.bot.uncache_listing(oc.server, oc.user_id)
+            await ctx.reply(embed=oc.embed)
 
     @commands.command(aliases=["deletechar", "removechar"])
     async def delchar(self, ctx: commands.Context[Client], *, oc: CharacterArg):
@@ -399,22 +897,28 @@ class Submission(commands.Cog):
         ocs: Character
             Characters to delete
         """
-        oc_ids = {x._id for x in ocs}
+        unique_ocs = list({oc._id: oc for oc in ocs}.values())
 
-        if not oc_ids:
+        if not unique_ocs:
             return await ctx.reply("No characters provided", ephemeral=True)
 
-        await self.db.delete_many(
-            {
-                "_id": {"$in": list(oc_ids)},
-                "user_id": ctx.author.id,
-                "server": ctx.guild and ctx.guild.id,
-            }
-        )
+        async with self.user_lock(ctx.author.id):
+            await self.db.delete_many(
+                {
+                    "_id": {"$in": [oc._id for oc in unique_ocs]},
+                    "user_id": ctx.author.id,
+                    "server": ctx.guild and ctx.guild.id,
+                }
+            )
+            for oc in unique_ocs:
+                self.bot.uncache_character(oc)
+            self.bot.uncache_guild(ctx.guild and ctx.guild.id)
+            self.bot.uncache_listing(ctx.guild and ctx.guild.id, ctx.author.id)
+
         await ctx.reply(
             embed=discord.Embed(
-                title=f"Deleted {len(ocs)} characters",
-                description="\n".join(oc.display_name for oc in ocs),
+                title=f"Deleted {len(unique_ocs)} characters",
+                description="\n".join(oc.display_name for oc in unique_ocs),
             ),
         )
 
@@ -476,32 +980,22 @@ class Submission(commands.Cog):
         """
         points = kind.value * level + 42
 
-        embed = discord.Embed(title=f"Total Points = {points:,.2f}".replace(",", "\u2009"))
+        embed = discord.Embed(title=f"Total Points = {format_points(points)}")
         embed.set_author(name=f"Using {kind.name} which has {kind.value} points per level")
 
         try:
-            values = {
-                k: float(v)
-                for k, v in zip(
-                    [
-                        "HP",
-                        "Attack",
-                        "Defense",
-                        "Sp. Attack",
-                        "Sp. Defense",
-                        "Speed",
-                    ],
-                    str(stats or "1 1 1 1 1 1").split(),
-                    strict=True,
-                )
-            }
+            if stats is None:
+                items = DEFAULT_STATS
+            elif (items := STAT_FLOATS.get(stats)) is None:
+                items = tuple(map(float, stats.split()))
+            values = dict(zip(STAT_NAMES, items, strict=True))
 
             total_stat = sum(values.values())
             for stat, value in values.items():
                 perc = value / total_stat
                 embed.add_field(
                     name=f"{perc:.2%} | {stat}",
-                    value=f"{perc * points:,.2f}".replace(",", "\u2009"),
+                    value=format_points(perc * points),
                 )
 
             embed.set_footer(text="These stats are averages for a character of this level.")
@@ -523,48 +1017,8 @@ class Submission(commands.Cog):
         mean : Size
             Average size of the species (default: 1.0)
         """
-        lower_limit = 0.75 * mean
-        upper_limit = 1.25 * mean
-        std_dev = 0.15 * mean
-
-        # Generate x values for the normal distribution curve
-        x = np.linspace(mean - 2.5 * std_dev, mean + 2.5 * std_dev, 1000)
-
-        # Calculate the normal distribution values using scipy's norm.pdf function
-        y = norm.pdf(x, mean, std_dev)
-
-        # Create a mask for the shaded area between lower and upper limits
-        mask = (x >= lower_limit) & (x <= upper_limit)
-
-        # Calculate the area under the curve for the shaded region
-        area = np.trapz(y[mask], x[mask])
-        percentage = area * 100
-
-        # Convert mean, lower limit, upper limit, and standard deviation to feet-inches
-        mean_ft, mean_inch = mean // 0.3048, mean / 0.3048 % 1 * 12
-        std_dev_ft, std_dev_inch = std_dev // 0.3048, std_dev / 0.3048 % 1 * 12
-
-        # Determine the number of ticks dynamically based on the requirement
-        ticks_values = np.linspace(lower_limit, upper_limit, 5)
-        feet_ticks = [f"{val:.02f} m\n{int(val // 0.3048)}' {int(val / 0.3048 % 1 * 12)}\"ft" for val in ticks_values]
-
-        # Create the plot with improved aesthetics
-        plt.figure(figsize=(10, 6))
-        plt.plot(x, y, color="darkblue", label="Normal Distribution", linewidth=2)
-        plt.fill_between(x, y, where=mask, alpha=0.5, color="skyblue", label=f"Shaded Area ({percentage:.2f}%)")
-        plt.title(
-            f"Normal Distribution (Mean: {mean_ft:.0f}' {mean_inch:.1f}\" / {mean:.2f}m | SD: {std_dev_ft:.0f}' {std_dev_inch:.1f}\" / {std_dev:.2f}m)",
-            fontsize=16,
-        )
-        plt.legend(fontsize=12)
-        plt.grid(True, linestyle="--", alpha=0.7)
-        plt.xticks(ticks_values, feet_ticks, fontsize=12, fontweight="bold")
-        plt.tight_layout()
-
-        # Save the plot to a BytesIO object and send it to Discord
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png")
-        buf.seek(0)
+        async with PLOT_LOCK:
+            buf = await asyncio.to_thread(plot_size, mean)
         file = discord.File(buf, filename="plot.png")
         await ctx.reply(file=file, ephemeral=True)
 
@@ -587,7 +1041,7 @@ class Submission(commands.Cog):
         ctx: commands.Context[Client],
         oc: CharacterArg,
         *,
-        description: escape_mentions,
+        description: clean_mentions,
     ):
         """Edit a character
 
@@ -607,7 +1061,7 @@ class Submission(commands.Cog):
         self,
         ctx: commands.Context[Client],
         oc: CharacterArg,
-        name: remove_markdown,
+        name: clean_markdown,
     ):
         """Edit a character
 
@@ -626,12 +1080,24 @@ class Submission(commands.Cog):
         if not name or len(name) > 256:
             return await ctx.reply("Name must be less than 256 characters.")
 
-        await self.db.update_one(
-            {"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id},
-            {"$set": {"name": name}},
-            upsert=True,
-        )
-        await ctx.reply(f"Changed {oc.name!r} to {name!r}", ephemeral=True)
+        async with self.user_lock(ctx.author.id):
+            try:
+                result = await self.db.update_one(
+                    {"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id},
+                    {"$set": {"name": name}},
+                )
+            except DuplicateKeyError:
+                return await ctx.reply(f"{name!r} already exists.", ephemeral=True)
+
+            self.bot.uncache_character(oc)
+            if not result.matched_count:
+                return await ctx.reply(f"Character {oc.name!r} not found.", ephemeral=True)
+
+            old_name, oc.name = oc.name, name
+            self.bot.cache_character(oc)
+            self.bot.uncache_guild(oc.server)
+            self.bot.uncache_listing(oc.server, oc.user_id)
+            await ctx.reply(f"Changed {old_name!r} to {name!r}", ephemeral=True)
 
     @commands.guild_only()
     @commands.command(aliases=["editname", "rename"])
@@ -658,7 +1124,7 @@ class Submission(commands.Cog):
         ctx: commands.Context[Client],
         oc: CharacterArg,
         *,
-        description: escape_mentions,
+        description: clean_mentions,
     ):
         """Edit a character
 
@@ -671,21 +1137,29 @@ class Submission(commands.Cog):
         description : str
             Description of the character
         """
+        if not description.strip():
+            return await ctx.reply("Description cannot be empty!", ephemeral=True)
+
         if ctx.message and ctx.message.attachments:
-            description, *imgs = description.split("\n# Attachments\n")
-            imgs = "\n".join(x.strip() for x in imgs if x) + "\n".join(
-                f"* {item.proxy_url}" for item in ctx.message.attachments
-            )
-            description = f"{description.strip()}\n# Attachments\n{imgs}"
+            description = add_attachments(description, (item.proxy_url for item in ctx.message.attachments))
 
         if description == oc.description:
             return await ctx.reply("You can't set the same description.", ephemeral=True)
 
-        await self.db.update_one(
-            {"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id},
-            {"$set": {"description": description}},
-        )
-        await ctx.reply(f"Changed description of {oc.name!r}", ephemeral=True)
+        async with self.user_lock(ctx.author.id):
+            result = await self.db.update_one(
+                {"_id": oc._id, "user_id": ctx.author.id, "server": ctx.guild and ctx.guild.id},
+                {"$set": {"description": description}},
+            )
+            if not result.matched_count:
+                self.bot.uncache_character(oc)
+                return await ctx.reply(f"Character {oc.name!r} not found.", ephemeral=True)
+
+            oc.description = description
+            self.bot.cache_character(oc)
+            self.bot.uncache_guild(oc.server)
+            self.bot.uncache_listing(oc.server, oc.user_id)
+            await ctx.reply(f"Changed description of {oc.name!r}", ephemeral=True)
 
     @commands.guild_only()
     @commands.command()
@@ -694,7 +1168,7 @@ class Submission(commands.Cog):
         ctx: commands.Context[Client],
         oc: CharacterArg,
         *,
-        description: escape_mentions,
+        description: clean_mentions,
     ):
         """Edit a character
 
@@ -727,6 +1201,40 @@ class Submission(commands.Cog):
         """
         await ctx.invoke(self.list, user=user)
 
+    async def list_description(self, user_id: int, server: Optional[int]) -> str:
+        """Bullet list of a user's characters in a server, cached for a few seconds
+
+        Parameters
+        ----------
+        user_id : int
+            User to get the characters from
+        server : Optional[int]
+            Server the characters belong to
+
+        Returns
+        -------
+        str
+            Sorted list of characters
+        """
+        if (description := self.bot.list_cache.get((server, user_id))) is not None:
+            return description
+
+        cursor = self.db.find(
+            {"user_id": user_id, "server": server},
+            {"name": 1, "description": 1},
+        ).sort("name", 1)
+        if docs := await cursor.to_list(length=None):
+            rows = sorted(
+                ((parse_oc_name(oc["name"], oc["description"]), oc) for oc in docs),
+                key=itemgetter(0),
+            )
+            description = "\n".join(f"* {parse_display_name(oc['name'], oc['description'])}" for _, oc in rows)
+        else:
+            description = "Doesn't have any characters."
+
+        self.bot.list_cache[(server, user_id)] = description
+        return description
+
     @char.command()
     async def list(
         self,
@@ -742,22 +1250,11 @@ class Submission(commands.Cog):
         user : discord.Member | discord.User
             User to get the characters from
         """
-        ocs = [
-            Character(**oc)
-            async for oc in self.db.find(
-                {
-                    "user_id": user.id,
-                    "server": ctx.guild and ctx.guild.id,
-                }
-            )
-        ]
-        ocs.sort(key=lambda oc: oc.oc_name)
-        description = "\n".join(f"* {oc.display_name}" for oc in ocs) or "Doesn't have any characters."
+        description = await self.list_description(user.id, ctx.guild and ctx.guild.id)
 
-        embed = discord.Embed(
-            color=ctx.author.color,
-            description=description,
-        )
+        embed = copy(LIST_EMBED)
+        embed.color = ctx.author.color
+        embed.description = description
         embed.set_author(name=user.display_name, icon_url=user.display_avatar)
         await ctx.reply(embed=embed, ephemeral=True)
 
@@ -771,26 +1268,15 @@ class Submission(commands.Cog):
         member : discord.Member | discord.User
             User to get the characters from
         """
-        ocs = [
-            Character(**oc)
-            async for oc in self.db.find(
-                {
-                    "user_id": member.id,
-                    "server": itx.guild_id,
-                }
-            )
-        ]
-        ocs.sort(key=lambda oc: oc.oc_name)
-        description = "\n".join(f"* {oc.display_name}" for oc in ocs) or "Doesn't have any characters."
+        description = await self.list_description(member.id, itx.guild_id)
 
-        embed = discord.Embed(
-            title="Characters",
-            color=member.color,
-            description=description,
-        )
+        embed = copy(LIST_EMBED)
+        embed.color = member.color
+        embed.description = description
         embed.set_author(name=member.display_name, icon_url=member.display_avatar)
         await itx.response.send_message(embed=embed, ephemeral=True)
 
+
 async def setup(bot: Client):
     """Load the cog
 
@@ -0,0 +1,56 @@
+# Copyright 2023 Vioshim
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Iterable
+
+__all__ = ("PrefixIndex",)
+
+
+class PrefixIndex:
+    """Case insensitive prefix lookups over a fixed set of names
+
+    Names are kept sorted by their casefolded form, so a lookup is two binary
+    searches plus a slice instead of scoring every name.
+    """
+
+    __slots__ = ("keys", "names")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        rows = sorted((name.casefold(), name) for name in names)
+        self.keys = [key for key, _ in rows]
+        self.names = [name for _, name in rows]
+
+    def search(self, prefix: str, limit: int = 25) -> list[str]:
+        """Names starting with a prefix
+
+        Parameters
+        ----------
+        prefix : str
+            Start of the name, case insensitive
+        limit : int, optional
+            Maximum amount of names, by default 25
+
+        Returns
+        -------
+        list[str]
+            Matching names in alphabetical order
+        """
+        prefix = prefix.casefold()
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        return self.names[lo : min(hi, lo + limit)]
@@ -15,14 +15,14 @@
 
 from __future__ import annotations
 
-import contextlib
+from contextlib import suppress
 from typing import Optional
 
 from discord import Attachment, Interaction, TextStyle
-from discord.ext import commands
 from discord.ui import Modal, TextInput
+from pymongo.errors import DuplicateKeyError
 
-from classes.character import Character
+from classes.character import Character, add_attachments
 from classes.client import Client
 from cogs.submission.sheets import Sheet
 
@@ -60,14 +60,6 @@ class CreateCharacterModal(Modal, title="Create Character"):
         )
 
     async def on_submit(self, interaction: Interaction[Client]):
-        with contextlib.suppress(commands.BadArgument):
-            if oc := await Character.converter(interaction, self.name.value):
-                await interaction.response.send_message(
-                    f"Character {oc.name!r} already exists!",
-                    ephemeral=True,
-                )
-                return self.stop()
-
         name, desc = self.name.value.strip(), self.desc.value.strip()
         if not (name and desc):
             await interaction.response.send_message(
@@ -76,35 +68,50 @@ class CreateCharacterModal(Modal, title="Create Character"):
             )
             return self.stop()
 
+        # Acknowledge before touching the database, so slow writes cannot expire the interaction.
+        # The deferred message is private, errors replace it and the sheet is posted after it
+        await interaction.response.defer(thinking=True, ephemeral=True)
         db = interaction.client.db("Characters")
-        await interaction.response.defer(thinking=True, ephemeral=False)
-        info = interaction.client.wrapper.wrap(desc)
-        for i, text in enumerate(info):
-            files = [await self.image.to_file()] if i == len(info) - 1 and self.image else []
-            msg = await interaction.followup.send(content=text, files=files, wait=True)
-            if msg.attachments:
-                self.image = msg.attachments[0]
+        key = {"name": name, "user_id": interaction.user.id, "server": interaction.guild_id}
+        # Same upsert as the add command, an existing name is left untouched even without the unique index
+        try:
+            result = await db.update_one(key, {"$setOnInsert": {"description": desc}}, upsert=True)
+            oc_id = result.upserted_id
+        except DuplicateKeyError:
+            oc_id = None
+
+        if oc_id is None:
+            await interaction.followup.send(
+                f"Character {name!r} already exists!",
+                ephemeral=True,
+            )
+            return self.stop()
+
+        await interaction.edit_original_response(content=f"Character {name!r} created.")
+        *head, last = interaction.client.wrapper.wrap(desc)
+        # Sequential on purpose, concurrent followups can post out of order
+        for text in head:
+            await interaction.followup.send(content=text)
+
+        files = [await self.image.to_file()] if self.image else []
+        msg = await interaction.followup.send(content=last, files=files, wait=True)
+        if msg.attachments:
+            self.image = msg.attachments[0]
 
         if self.image:
-            desc, *imgs = desc.split("\n# Attachments\n")
-            imgs = "\n".join(x.strip() for x in imgs if x) + f"\n* {self.image.proxy_url}"
-            desc = f"{desc.strip()}\n# Attachments\n{imgs}"
-
-        result = await db.insert_one(
-            {
-                "name": name,
-                "description": desc,
-                "user_id": interaction.user.id,
-                "server": interaction.guild_id,
-            }
-        )
+            desc = add_attachments(desc, (self.image.proxy_url,))
+            await db.update_one({"_id": oc_id}, {"$set": {"description": desc}})
+
         oc = Character(
-            _id=result.inserted_id,
+            _id=oc_id,
             user_id=interaction.user.id,
             name=name,
             description=desc,
             server=interaction.guild_id or 0,
         )
+        interaction.client.cache_character(oc)
+        interaction.client.uncache_guild(interaction.guild_id)
+        interaction.client.uncache_listing(interaction.guild_id, interaction.user.id)
 
         self.stop()
 
@@ -132,15 +139,6 @@ class UpdateCharacterModal(Modal, title="Update Character"):
         self.add_item(self.desc)
 
     async def on_submit(self, interaction: Interaction[Client]):
-        with contextlib.suppress(commands.BadArgument):
-            oc = await Character.converter(interaction, self.name.value)
-            if oc != self.character:
-                await interaction.response.send_message(
-                    f"Character {oc.name!r} already exists!",
-                    ephemeral=True,
-                )
-                return self.stop()
-
         oc = self.character
         name, desc = self.name.value.strip(), self.desc.value.strip()
         if not (name and desc):
@@ -150,14 +148,44 @@ class UpdateCharacterModal(Modal, title="Update Character"):
             )
             return self.stop()
 
+        # Private like the errors below, the updated sheet is posted after it
+        await interaction.response.defer(thinking=True, ephemeral=True)
         db = interaction.client.db("Characters")
-        await db.update_one(
-            {"_id": oc._id, "server": interaction.guild_id},
-            {"$set": {"name": name, "description": desc}},
+        # Renames are checked up front as well, in case the unique index could not be built
+        taken = name != oc.name and await db.find_one(
+            {"name": name, "user_id": oc.user_id, "server": interaction.guild_id, "_id": {"$ne": oc._id}},
+            {"_id": 1},
         )
-        await interaction.response.defer(thinking=True, ephemeral=False)
+        result = None
+        if not taken:
+            with suppress(DuplicateKeyError):
+                result = await db.update_one(
+                    {"_id": oc._id, "server": interaction.guild_id},
+                    {"$set": {"name": name, "description": desc}},
+                )
+
+        if result is None:
+            await interaction.followup.send(
+                f"Character {name!r} already exists!",
+                ephemeral=True,
+            )
+            return self.stop()
+
+        if not result.matched_count:
+            interaction.client.uncache_character(oc)
+            await interaction.followup.send(
+                f"Character {oc.name!r} not found.",
+                ephemeral=True,
+            )
+            return self.stop()
+
+        interaction.client.uncache_character(oc)
         oc.name, oc.description = name, desc
-        for text in interaction.client.wrapper.wrap(oc.description):
+        interaction.client.cache_character(oc)
+        interaction.client.uncache_guild(interaction.guild_id)
+        interaction.client.uncache_listing(interaction.guild_id, oc.user_id)
+        await interaction.edit_original_response(content=f"Character {name!r} updated.")
+        for text in oc.wrapped:
             await interaction.followup.send(content=text)
 
         self.stop()
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 
+import sys
 from enum import StrEnum, auto
+from types import MappingProxyType
 
 BASE_TEMPLATES = {
     "Normal": """
@@ -67,6 +69,8 @@ BASE_TEMPLATES = {
 **Inherit:** (Optional, only if you have Inherit. For Second Inherit, you can have 2 of these in a character.)
 """.strip(),  # noqa: W291
 }
+# Read only and interned, every modal shares the same template objects
+BASE_TEMPLATES = MappingProxyType({k: sys.intern(v) for k, v in BASE_TEMPLATES.items()})
 
 
 class Sheet(StrEnum):
@@ -76,4 +80,8 @@ class Sheet(StrEnum):
 
     @property
     def template(self) -> str:
-        return BASE_TEMPLATES[self.name]
+        return SHEET_TEMPLATES[self]
+
+
+# Keyed by member, so looking up a template skips the Enum.name descriptor
+SHEET_TEMPLATES = MappingProxyType({sheet: BASE_TEMPLATES[sheet.name] for sheet in Sheet})
@@ -15,15 +15,20 @@
 
 from __future__ import annotations
 
+import re
 from contextlib import suppress
 from enum import IntEnum, StrEnum
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional
 
 from discord import Interaction
 from discord.app_commands import Choice, Transform, Transformer
 from discord.ext import commands
-from rapidfuzz import process
+from rapidfuzz import fuzz, process
 
 from classes.client import Client
+from cogs.submission.fuzzy import PrefixIndex
 
 
 class Stats(StrEnum):
@@ -46,61 +51,154 @@ class Kind(IntEnum):
     Pure_Legendary = 30
 
 
-SIZES = dict(
-    Eevee=0.3,
-    Vaporeon=1.0,
-    Jolteon=0.8,
-    Flareon=0.9,
-    Espeon=0.9,
-    Umbreon=1.0,
-    Leafeon=1.0,
-    Glaceon=0.8,
-    Sylveon=1.0,
+SIZES = MappingProxyType(
+    dict(
+        Eevee=0.3,
+        Vaporeon=1.0,
+        Jolteon=0.8,
+        Flareon=0.9,
+        Espeon=0.9,
+        Umbreon=1.0,
+        Leafeon=1.0,
+        Glaceon=0.8,
+        Sylveon=1.0,
+    )
 )
 
+STAT_PRESETS = tuple(Stats)
+# Stats is a StrEnum, so plain value strings look up the same entries
+STAT_FLOATS: dict[Stats, tuple[float, ...]] = {x: tuple(float(v) for v in x.value.split()) for x in STAT_PRESETS}
+KINDS = tuple(Kind)
+STATS_BY_NAME = {x.name: x for x in STAT_PRESETS}
+KINDS_BY_NAME = {x.name: x for x in KINDS}
+# Case insensitive exact lookups, kinds also accept spaces for underscores
+STATS_BY_KEY = {x.name.casefold(): x for x in Stats}
+KINDS_BY_KEY = {k: x for x in Kind for k in (x.name.casefold(), x.name.casefold().replace("_", " "))}
+SIZES_BY_KEY = {x.casefold(): x for x in SIZES}
+# Plain name lists let rapidfuzz score without a per candidate processor,
+# matches are mapped back through their index into the parallel member tuples
+STAT_PRESET_NAMES = tuple(x.name for x in STAT_PRESETS)
+KIND_NAMES = tuple(x.name for x in KINDS)
+SIZE_NAMES = tuple(SIZES)
+STAT_PREFIXES = PrefixIndex(STAT_PRESET_NAMES)
+KIND_PREFIXES = PrefixIndex(KIND_NAMES)
+SIZE_PREFIXES = PrefixIndex(SIZE_NAMES)
+# Choices are built once and shared by every autocomplete call
+STAT_CHOICE_FOR = {x: Choice(name=x.name, value=x.value) for x in STAT_PRESETS}
+KIND_CHOICE_FOR = {x: Choice(name=x.name, value=x.name) for x in KINDS}
+SIZE_CHOICE_FOR = {x: Choice(name=x, value=x) for x in SIZE_NAMES}
+STAT_CHOICES = list(STAT_CHOICE_FOR.values())
+KIND_CHOICES = list(KIND_CHOICE_FOR.values())
+SIZE_CHOICES = list(SIZE_CHOICE_FOR.values())
+
+NUMBER = r"\d*\.?\d+"
+SIZE_RE = re.compile(
+    rf"""^\s*(?:
+        (?P<feet>{NUMBER})\s*(?:'|ft)\s*(?:(?P<inches>{NUMBER})\s*(?:"|in)?)?
+        |(?P<only_inches>{NUMBER})\s*(?:"|in)
+        |(?P<meters>{NUMBER})\s*m?
+    )\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+@lru_cache(maxsize=1024)
+def match_stat(argument: str) -> Optional[Stats]:
+    """Closest preset for an already title cased argument"""
+    if (preset := STATS_BY_KEY.get(argument.strip().casefold())) is not None:
+        return preset
+    item = process.extractOne(argument, STAT_PRESET_NAMES, scorer=fuzz.WRatio, score_cutoff=85)
+    return STAT_PRESETS[item[2]] if item else None
+
+
+@lru_cache(maxsize=1024)
+def suggest_stats(value: str) -> tuple[Stats, ...]:
+    """Presets worth suggesting for an already title cased value"""
+    if names := STAT_PREFIXES.search(value):
+        return tuple(STATS_BY_NAME[x] for x in names)
+    items = process.extract(value, STAT_PRESET_NAMES, scorer=fuzz.WRatio, limit=25, score_cutoff=50)
+    return tuple(STAT_PRESETS[i] for _, _, i in items)
+
+
+@lru_cache(maxsize=1024)
+def match_size(argument: str) -> Optional[str]:
+    """Closest species in SIZES for an already title cased argument"""
+    if (name := SIZES_BY_KEY.get(argument.strip().casefold())) is not None:
+        return name
+    item = process.extractOne(argument, SIZE_NAMES, scorer=fuzz.WRatio, score_cutoff=90)
+    return item[0] if item else None
+
+
+@lru_cache(maxsize=1024)
+def suggest_sizes(value: str) -> tuple[str, ...]:
+    """Species in SIZES worth suggesting for an already title cased value"""
+    if names := SIZE_PREFIXES.search(value):
+        return tuple(names)
+    items = process.extract(value, SIZE_NAMES, scorer=fuzz.WRatio, limit=25, score_cutoff=50)
+    return tuple(x for x, _, _ in items)
+
+
+@lru_cache(maxsize=1024)
+def match_kind(argument: str) -> Optional[Kind]:
+    """Closest kind for an already title cased argument"""
+    if (kind := KINDS_BY_KEY.get(argument.strip().casefold())) is not None:
+        return kind
+    item = process.extractOne(argument, KIND_NAMES, scorer=fuzz.WRatio, score_cutoff=85)
+    return KINDS[item[2]] if item else None
+
+
+@lru_cache(maxsize=1024)
+def suggest_kinds(value: str) -> tuple[Kind, ...]:
+    """Kinds worth suggesting for an already title cased value"""
+    if names := KIND_PREFIXES.search(value):
+        return tuple(KINDS_BY_NAME[x] for x in names)
+    items = process.extract(value, KIND_NAMES, scorer=fuzz.WRatio, limit=25, score_cutoff=50)
+    return tuple(KINDS[i] for _, _, i in items)
+
 
 class StatTransformer(commands.Converter[str], Transformer):
     async def process(self, argument: str) -> str:
-        if argument and (
-            item := process.extractOne(
-                argument.title(),
-                Stats,
-                score_cutoff=85,
-                processor=lambda x: x.name if isinstance(x, Stats) else x,
-            )
-        ):
-            return item[0].value
-
-        value = str(argument or "1 1 1 1 1 1").split()
+        if argument and (item := match_stat(argument.title())):
+            return item.value
+
+        value = (argument or "1 1 1 1 1 1").split()
 
         if len(value) != 6:
             raise commands.BadArgument(f"Invalid stat string: {argument}")
 
+        # Whole numbers are the usual input, isdecimal only accepts what float() parses
+        if all(x.isdecimal() for x in value):
+            return " ".join(value)
+
         try:
-            values = [float(x) for x in value]
-            return " ".join(map(str, values))
+            return " ".join(str(float(x)) for x in value)
         except ValueError as e:
             raise commands.BadArgument(f"Invalid stat string: {argument}") from e
 
+    async def process_typed(self, argument: str) -> tuple[float, ...]:
+        """Six stats as numbers, presets skip parsing entirely
+
+        Parameters
+        ----------
+        argument : str
+            Preset name or six numbers separated by spaces
+
+        Returns
+        -------
+        tuple[float, ...]
+            Stat values
+        """
+        if argument and (item := match_stat(argument.title())):
+            return STAT_FLOATS[item]
+        return tuple(map(float, (await self.process(argument)).split()))
+
     async def transform(self, _: Interaction[Client], argument: str) -> str:
         return await self.process(argument)
 
     async def autocomplete(self, _: Interaction[Client], value: str, /) -> list[Choice[str]]:
-        choices = (
-            (
-                x
-                for x, _, _ in process.extract(
-                    value.title(),
-                    Stats,
-                    limit=25,
-                    score_cutoff=50,
-                    processor=lambda x: x.name if isinstance(x, Stats) else x,
-                )
-            )
-            if value
-            else Stats
-        )
-        return [Choice(name=item.name, value=item.value) for item in choices]
+        if not value:
+            return STAT_CHOICES
+        return [STAT_CHOICE_FOR[item] for item in suggest_stats(value.title())]
 
     async def convert(self, _: commands.Context[Client], argument: str):
         return await self.process(argument)
@@ -108,67 +206,28 @@ class StatTransformer(commands.Converter[str], Transformer):
 
 class SizeTransformer(commands.Converter[float], Transformer):
     async def process(self, argument: str) -> float:
-        if argument and (
-            item := process.extractOne(
-                argument.title(),
-                choices=SIZES.keys(),
-                score_cutoff=90,
-            )
-        ):
-            return SIZES[item[0]]
-        
-        if "'" in argument or "ft" in argument:
-            feet, inches = 0, 0
-            if "'" in argument:
-                feet, inches = map(str.strip, argument.split("'"))
-            elif "ft" in argument:
-                feet, inches = map(str.strip, argument.split("ft"))
-            
-            feet = float(feet)
-
-            if inches:
-                inches = float(inches.replace('"', ""))
+        if argument and (item := match_size(argument.title())):
+            return SIZES[item]
 
-            # To meters
-            return (feet * 12 + inches) * 0.0254
-        
-        if '"' in argument:
-            return float(argument.replace('"', "")) * 0.0254
-        
-        if "'" in argument:
-            return float(argument) * 0.3048
-        
-        try:
-            return float(argument.removesuffix("m").strip())
-        except ValueError:
-            raise commands.BadArgument(f"Invalid size string: {argument}") from None
+        if not (m := SIZE_RE.match(argument or "")):
+            raise commands.BadArgument(f"Invalid size string: {argument}")
 
-        
-        
-        raise commands.BadArgument(f"Invalid size string: {argument}")
-            
+        if m["feet"]:
+            # To meters
+            return (float(m["feet"]) * 12 + float(m["inches"] or 0)) * 0.0254
 
+        if m["only_inches"]:
+            return float(m["only_inches"]) * 0.0254
 
-        
+        return float(m["meters"])
 
     async def transform(self, _: Interaction[Client], argument: str) -> float:
         return await self.process(argument)
 
     async def autocomplete(self, _: Interaction[Client], value: str, /) -> list[Choice[str]]:
-        choices = (
-            (
-                x
-                for x, _, _ in process.extract(
-                    value.title(),
-                    choices=SIZES.keys(),
-                    limit=25,
-                    score_cutoff=50,
-                )
-            )
-            if value
-            else SIZES
-        )
-        return [Choice(name=item, value=item) for item in choices]
+        if not value:
+            return SIZE_CHOICES
+        return [SIZE_CHOICE_FOR[item] for item in suggest_sizes(value.title())]
 
     async def convert(self, _: commands.Context[Client], argument: str):
         return await self.process(argument)
@@ -176,15 +235,8 @@ class SizeTransformer(commands.Converter[float], Transformer):
 
 class KindTransformer(commands.Converter[Kind], Transformer):
     async def process(self, argument: str) -> Kind:
-        if argument and (
-            item := process.extractOne(
-                argument.title(),
-                Kind,
-                score_cutoff=85,
-                processor=lambda x: x.name if isinstance(x, Kind) else x,
-            )
-        ):
-            return item[0]
+        if argument and (item := match_kind(argument.title())):
+            return item
 
         raise commands.BadArgument(f"Invalid kind string: {argument}")
 
@@ -192,21 +244,9 @@ class KindTransformer(commands.Converter[Kind], Transformer):
         return await self.process(argument)
 
     async def autocomplete(self, _: Interaction[Client], value: str, /) -> list[Choice[str]]:
-        choices = (
-            (
-                x
-                for x, _, _ in process.extract(
-                    value.title(),
-                    Kind,
-                    limit=25,
-                    score_cutoff=50,
-                    processor=lambda x: x.name if isinstance(x, Kind) else x,
-                )
-            )
-            if value
-            else Kind
-        )
-        return [Choice(name=item.name, value=item.name) for item in choices]
+        if not value:
+            return KIND_CHOICES
+        return [KIND_CHOICE_FOR[item] for item in suggest_kinds(value.title())]
 
     async def convert(self, _: commands.Context[Client], argument: str) -> Kind:
         return await self.process(argument)
@@ -13,12 +13,25 @@
 # limitations under the License.
 
 
+from functools import lru_cache
+
 import d20
 import discord
 from discord.ext import commands
 
 from classes.client import Client
 
+ROLLER = d20.Roller()
+
+
+@lru_cache(maxsize=512)
+def parse_expression(expression: str) -> d20.diceast.Expression:
+    """Parsed dice expression, cached as the same few expressions repeat often
+
+    The parsed tree is never mutated by rolling, so it is safe to share.
+    """
+    return ROLLER.parse(expression, allow_comments=True)
+
 
 class Utilities(commands.Cog):
     def __init__(self, bot: Client):
@@ -55,7 +68,7 @@ class Utilities(commands.Cog):
         embed.set_image(url="https://dummyimage.com/500x5/FFFFFF/000000&text=%20")
 
         try:
-            value = d20.roll(expr=expression, allow_comments=True)
+            value = ROLLER.roll(parse_expression(expression))
             if len(value.result) > 4096:
                 d20.utils.simplify_expr(value.expr)
             embed.description = value.result
@@ -74,4 +87,6 @@ async def setup(bot: Client):
     bot : Client
        Bot instance
     """
+    # Warm the dice grammar and cache the default expression before the first /roll
+    ROLLER.roll(parse_expression("d20"))
     await bot.add_cog(Utilities(bot))
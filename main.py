@@ -17,6 +17,7 @@ from __future__ import annotations
 
 import asyncio
 import os
+import sys
 from logging import INFO, getLogger
 
 from dotenv import load_dotenv
@@ -42,13 +43,13 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    try:
+    # uvloop is a hard dependency everywhere it is supported
+    if sys.platform != "win32":
         import uvloop  # type: ignore
 
         loop_factory = uvloop.new_event_loop
-    except ModuleNotFoundError:
+    else:
         loop_factory = None
-        logger.error("Not using uvloop")
 
     with asyncio.Runner(loop_factory=loop_factory) as runner:
         runner.run(main())